@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for openai_cost_tracker.
+
+Runs `python -X importtime -c "import openai_cost_tracker"` in fresh interpreters
+and fails if the cumulative import time exceeds the budget, or if heavy
+dependencies are loaded eagerly.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 50] [--runs 5]
+"""
+
+import argparse
+import subprocess
+import sys
+
+PACKAGE = "openai_cost_tracker"
+
+# Modules that must only be imported when actually needed
+HEAVY_MODULES = ("openai", "httpx", "asyncio", "pydantic")
+
+
+def measure_import_us(module: str = PACKAGE) -> int:
+    """Cumulative import time of `module` in microseconds, measured in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    # Lines look like: "import time:       self |  cumulative | name"
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"No importtime entry for {module}:\n{result.stderr}")
+
+
+def eagerly_loaded(module: str = PACKAGE) -> list:
+    """Heavy modules that end up in sys.modules after a bare `import module`."""
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Max cumulative import time (best of runs)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to measure")
+    args = parser.parse_args()
+
+    # Take the best run — the rest is noise from the OS / disk cache
+    timings = [measure_import_us() / 1000 for _ in range(args.runs)]
+    best = min(timings)
+    print(f"import {PACKAGE}: best={best:.1f}ms  runs={', '.join(f'{t:.1f}' for t in timings)}  budget={args.budget_ms:.1f}ms")
+
+    ok = True
+    loaded = eagerly_loaded()
+    if loaded:
+        print(f"✗ Heavy modules imported eagerly: {', '.join(loaded)}")
+        ok = False
+    if best > args.budget_ms:
+        print(f"✗ Import time {best:.1f}ms is over budget {args.budget_ms:.1f}ms")
+        ok = False
+
+    if ok:
+        print("✓ Import time within budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Offline stand-in for the OpenAI API, served through `httpx.MockTransport`.
+
+Serves realistic payloads for chat completions, Responses API and embeddings,
+both regular and streaming (SSE), so `CostEstimator`/`AsyncCostEstimator`
+can be benchmarked without network or an API key.
+"""
+
+import base64
+import json
+import re
+import struct
+from typing import Any, Dict, Iterator, List
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+BASE_URL = "http://mock-openai.local/v1"
+CREATED = 1_700_000_000
+EMBEDDING_DIMS = 1536
+
+# Text the "model" answers with; split into stream deltas by words
+ANSWER = (
+    "The answer to the ultimate question of life, the universe, and everything is 42. "
+    "It was computed by Deep Thought over seven and a half million years."
+)
+
+
+def prompt_tokens(texts: List[str], per_item: int = 4) -> int:
+    """Deterministic token count of the request — ~4 chars per token plus per-item overhead."""
+    return sum(len(t) // 4 + per_item for t in texts) + 3
+
+
+def completion_tokens() -> int:
+    return len(ANSWER) // 4
+
+
+def _message_texts(messages: List[Dict[str, Any]]) -> List[str]:
+    texts = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            texts.extend(p.get("text", "") for p in content if isinstance(p, dict))
+    return texts
+
+
+def _responses_input_texts(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    return _message_texts(value or [])
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    p, c = prompt_tokens(_message_texts(body["messages"])), completion_tokens()
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": CREATED,
+        "model": body["model"],
+        "system_fingerprint": "fp_bench",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": ANSWER, "refusal": None},
+            "logprobs": None,
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": p,
+            "completion_tokens": c,
+            "total_tokens": p + c,
+            "prompt_tokens_details": {"cached_tokens": 0, "audio_tokens": 0},
+            "completion_tokens_details": {"reasoning_tokens": 0, "audio_tokens": 0},
+        },
+    }
+
+
+def chat_completion_chunks(body: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    full = chat_completion(body)
+    chunk = {k: full[k] for k in ("id", "created", "model", "system_fingerprint")}
+    chunk["object"] = "chat.completion.chunk"
+
+    yield {**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    for word in ANSWER.split(" "):
+        yield {**chunk, "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+    yield {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield {**chunk, "choices": [], "usage": full["usage"]}
+
+
+def response(body: Dict[str, Any], status: str = "completed") -> Dict[str, Any]:
+    p, c = prompt_tokens(_responses_input_texts(body.get("input"))), completion_tokens()
+    return {
+        "id": "resp_bench",
+        "object": "response",
+        "created_at": CREATED,
+        "status": status,
+        "model": body["model"],
+        "output": [{
+            "type": "message",
+            "id": "msg_bench",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": ANSWER, "annotations": []}],
+        }] if status == "completed" else [],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "error": None,
+        "incomplete_details": None,
+        "instructions": None,
+        "metadata": {},
+        "temperature": 1.0,
+        "top_p": 1.0,
+        "usage": {
+            "input_tokens": p,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": c,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": p + c,
+        } if status == "completed" else None,
+    }
+
+
+def response_events(body: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """The full event sequence of a streamed response with a single text message, as the API sends it."""
+    final = response(body)
+    item = final["output"][0]
+    part = item["content"][0]
+    ids = {"item_id": item["id"], "output_index": 0, "content_index": 0}
+
+    events: List[Dict[str, Any]] = [
+        {"type": "response.created", "response": response(body, status="in_progress")},
+        {"type": "response.in_progress", "response": response(body, status="in_progress")},
+        {"type": "response.output_item.added", "output_index": 0,
+         "item": {**item, "status": "in_progress", "content": []}},
+        {"type": "response.content_part.added", **ids, "part": {**part, "text": ""}},
+    ]
+    events.extend(
+        {"type": "response.output_text.delta", **ids, "delta": delta, "logprobs": []}
+        for delta in re.findall(r"\S+\s*", ANSWER)
+    )
+    events += [
+        {"type": "response.output_text.done", **ids, "text": ANSWER, "logprobs": []},
+        {"type": "response.content_part.done", **ids, "part": part},
+        {"type": "response.output_item.done", "output_index": 0, "item": item},
+        {"type": "response.completed", "response": final},
+    ]
+    for seq, event in enumerate(events):
+        yield {**event, "sequence_number": seq}
+
+
+def embeddings(body: Dict[str, Any]) -> Dict[str, Any]:
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dims = body.get("dimensions") or EMBEDDING_DIMS
+    vector = [((i % 17) - 8) / 100 for i in range(dims)]
+    if body.get("encoding_format") == "base64":
+        encoded = base64.b64encode(struct.pack(f"<{dims}f", *vector)).decode()
+        data = [{"object": "embedding", "index": i, "embedding": encoded} for i in range(len(inputs))]
+    else:
+        data = [{"object": "embedding", "index": i, "embedding": vector} for i in range(len(inputs))]
+    p = prompt_tokens([i if isinstance(i, str) else "x" * 4 * len(i) for i in inputs], per_item=1) - 3
+    return {
+        "object": "list",
+        "model": body["model"],
+        "data": data,
+        "usage": {"prompt_tokens": p, "total_tokens": p},
+    }
+
+
+def _sse(events: Iterator[Dict[str, Any]], named: bool) -> bytes:
+    lines = []
+    for event in events:
+        if named:
+            lines.append(f"event: {event['type']}\n")
+        lines.append(f"data: {json.dumps(event)}\n\n")
+    if not named:
+        lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode()
+
+
+def handle(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content or b"{}")
+    path = request.url.path
+    stream = bool(body.get("stream"))
+
+    if path.endswith("/chat/completions"):
+        if stream:
+            return httpx.Response(200, content=_sse(chat_completion_chunks(body), named=False),
+                                  headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json=chat_completion(body))
+
+    if path.endswith("/responses"):
+        if stream:
+            return httpx.Response(200, content=_sse(response_events(body), named=True),
+                                  headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json=response(body))
+
+    if path.endswith("/embeddings"):
+        return httpx.Response(200, json=embeddings(body))
+
+    return httpx.Response(404, json={"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}})
+
+
+def make_client() -> OpenAI:
+    return OpenAI(
+        api_key="sk-bench",
+        base_url=BASE_URL,
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(handle), base_url=BASE_URL),
+    )
+
+
+def make_async_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key="sk-bench",
+        base_url=BASE_URL,
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handle), base_url=BASE_URL),
+    )
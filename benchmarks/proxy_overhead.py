@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Offline load test of CostEstimator / AsyncCostEstimator against a mock OpenAI API.
+
+Measures:
+  - added latency of the proxy per call (chat, chat stream, responses, responses stream
+    and its `responses.stream()` helper, embeddings)
+  - throughput of AsyncCostEstimator with N concurrent callers
+  - memory growth per call over a long run
+
+and compares the results with benchmarks/baselines.json — a metric worse than
+its baseline by more than the tolerance fails the run.
+
+Usage:
+    python benchmarks/proxy_overhead.py [--quick] [--tolerance 0.3] [--update-baseline]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_openai  # noqa: E402
+from openai_cost_tracker import AsyncCostEstimator, CostEstimator  # noqa: E402
+from openai_cost_tracker.output.base import BaseOutput  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant. Answer briefly."},
+    {"role": "user", "content": "Answer to the Ultimate Question of Life, the Universe, and Everything?"},
+]
+
+# Allowed absolute slack on top of the relative tolerance, by metric suffix — keeps
+# near-zero metrics (memory per call, a few µs of overhead) from failing on noise.
+SLACK = {"_us": 50.0, "_bytes_per_call": 16.0, "_calls_per_s": 0.0}
+
+
+class NoOutput(BaseOutput):
+    def output(self, totals) -> None:
+        pass
+
+
+def _sync_calls(client) -> Dict[str, Callable[[], Any]]:
+    def chat_stream():
+        for _ in client.chat.completions.create(
+            model="gpt-4o-mini", messages=MESSAGES, stream=True, stream_options={"include_usage": True},
+        ):
+            pass
+
+    def responses_stream():
+        for _ in client.responses.create(model="gpt-4o-mini", input="Tell me a joke", stream=True):
+            pass
+
+    def responses_stream_helper():
+        with client.responses.stream(model="gpt-4o-mini", input="Tell me a joke") as stream:
+            for _ in stream:
+                pass
+
+    return {
+        "chat": lambda: client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES),
+        "chat_stream": chat_stream,
+        "responses": lambda: client.responses.create(model="gpt-4o-mini", input="Tell me a joke"),
+        "responses_stream": responses_stream,
+        "responses_stream_helper": responses_stream_helper,
+        "embeddings": lambda: client.embeddings.create(model="text-embedding-3-small", input="Hello world"),
+    }
+
+
+def _async_calls(client) -> Dict[str, Callable[[], Any]]:
+    async def chat_stream():
+        async for _ in await client.chat.completions.create(
+            model="gpt-4o-mini", messages=MESSAGES, stream=True, stream_options={"include_usage": True},
+        ):
+            pass
+
+    async def responses_stream():
+        async for _ in await client.responses.create(model="gpt-4o-mini", input="Tell me a joke", stream=True):
+            pass
+
+    async def responses_stream_helper():
+        async with client.responses.stream(model="gpt-4o-mini", input="Tell me a joke") as stream:
+            async for _ in stream:
+                pass
+
+    return {
+        "chat": lambda: client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES),
+        "chat_stream": chat_stream,
+        "responses": lambda: client.responses.create(model="gpt-4o-mini", input="Tell me a joke"),
+        "responses_stream": responses_stream,
+        "responses_stream_helper": responses_stream_helper,
+        "embeddings": lambda: client.embeddings.create(model="text-embedding-3-small", input="Hello world"),
+    }
+
+
+def _added_us(raw: Callable[[], Any], proxied: Callable[[], Any], calls: int) -> float:
+    """Median of paired differences: every proxied call is timed right after the same raw call."""
+    diffs = []
+    clock = time.perf_counter
+    for _ in range(calls):
+        t0 = clock()
+        raw()
+        t1 = clock()
+        proxied()
+        t2 = clock()
+        diffs.append((t2 - t1) - (t1 - t0))
+    return statistics.median(diffs) * 1e6
+
+
+async def _aadded_us(raw: Callable[[], Any], proxied: Callable[[], Any], calls: int) -> float:
+    diffs = []
+    clock = time.perf_counter
+    for _ in range(calls):
+        t0 = clock()
+        await raw()
+        t1 = clock()
+        await proxied()
+        t2 = clock()
+        diffs.append((t2 - t1) - (t1 - t0))
+    return statistics.median(diffs) * 1e6
+
+
+def _check_counted(name: str, estimator: Any, expected: int) -> None:
+    """Sanity check: the proxy must have actually counted every call, streams included."""
+    if estimator.totals.requests != expected:
+        raise RuntimeError(f"{name}: counted {estimator.totals.requests} of {expected} calls")
+
+
+async def bench_latency(calls: int) -> Dict[str, float]:
+    """
+    Added latency per call: proxied call minus the same call on the bare client.
+    Raw and proxied calls alternate, so drift and scheduler noise affect both sides equally.
+    """
+    metrics = {}
+    warmup = 5
+
+    client = mock_openai.make_client()
+    estimator = CostEstimator(client, custom_output=NoOutput())
+    async with estimator as proxy:
+        raw, wrapped = _sync_calls(client), _sync_calls(proxy)
+        for name in raw:
+            _added_us(raw[name], wrapped[name], warmup)
+            metrics[f"sync_{name}_added_latency_us"] = max(0.0, _added_us(raw[name], wrapped[name], calls))
+    _check_counted("sync", estimator, len(raw) * (warmup + calls))
+
+    aclient = mock_openai.make_async_client()
+    aestimator = AsyncCostEstimator(aclient, custom_output=NoOutput())
+    async with aestimator as aproxy:
+        raw, wrapped = _async_calls(aclient), _async_calls(aproxy)
+        for name in raw:
+            await _aadded_us(raw[name], wrapped[name], warmup)
+            metrics[f"async_{name}_added_latency_us"] = max(0.0, await _aadded_us(raw[name], wrapped[name], calls))
+    _check_counted("async", aestimator, len(raw) * (warmup + calls))
+
+    return metrics
+
+
+async def bench_throughput(concurrency: List[int], calls: int) -> Dict[str, float]:
+    """Chat calls per second through AsyncCostEstimator with N concurrent callers."""
+    metrics = {}
+    for n in concurrency:
+        estimator = AsyncCostEstimator(mock_openai.make_async_client(), custom_output=NoOutput())
+        per_caller = max(1, calls // n)
+
+        async with estimator as proxy:
+            async def caller():
+                for _ in range(per_caller):
+                    await proxy.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(caller() for _ in range(n)))
+            elapsed = time.perf_counter() - start
+
+        expected = per_caller * n
+        _check_counted(f"concurrency {n}", estimator, expected)
+        metrics[f"async_chat_concurrency_{n}_calls_per_s"] = expected / elapsed
+    return metrics
+
+
+class _FakeResource:
+    """In-process resource returning a prebuilt response — no HTTP, so millions of calls are feasible."""
+
+    def __init__(self, response: Any, is_async: bool):
+        self._response = response
+        self._is_async = is_async
+
+    def create(self, **kwargs):
+        if self._is_async:
+            async def _create():
+                # yield to the loop like real I/O would
+                await asyncio.sleep(0)
+                return self._response
+            return _create()
+        return self._response
+
+
+class _FakeClient:
+    def __init__(self, response: Any, is_async: bool):
+        self.completions = _FakeResource(response, is_async)
+
+
+async def bench_memory(calls: int) -> Dict[str, float]:
+    """Traced memory growth per call after warm-up, for both estimators."""
+    from openai.types.chat.chat_completion import ChatCompletion
+
+    response = ChatCompletion.model_validate(mock_openai.chat_completion({"model": "gpt-4o-mini", "messages": MESSAGES}))
+    metrics = {}
+    warmup = min(1000, calls)
+
+    for name, estimator_cls, is_async in (
+        ("sync", CostEstimator, False),
+        ("async", AsyncCostEstimator, True),
+    ):
+        estimator = estimator_cls(_FakeClient(response, is_async), custom_output=NoOutput())
+        async with estimator as proxy:
+            create = proxy.completions.create
+
+            async def run(n: int) -> None:
+                for i in range(n):
+                    res = create(model="gpt-4o-mini", messages=MESSAGES)
+                    if is_async:
+                        await res
+
+            await run(warmup)
+            gc.collect()
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            await run(calls)
+        # measured after exit, when all pending totals updates are done
+        await asyncio.sleep(0)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        _check_counted(name, estimator, calls + warmup)
+        metrics[f"{name}_memory_growth_bytes_per_call"] = max(0.0, (after - before) / calls)
+    return metrics
+
+
+def compare(metrics: Dict[str, float], baselines: Dict[str, float], tolerance: float) -> List[str]:
+    """Metrics that regressed against the baselines."""
+    failures = []
+    for name, value in metrics.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        slack = next((v for suffix, v in SLACK.items() if name.endswith(suffix)), 0.0)
+        if name.endswith("_calls_per_s"):
+            regressed = value < baseline * (1 - tolerance) - slack
+        else:
+            regressed = value > baseline * (1 + tolerance) + slack
+        if regressed:
+            failures.append(f"{name}: {value:.2f} vs baseline {baseline:.2f}")
+    return failures
+
+
+async def run_all(args) -> Dict[str, float]:
+    metrics: Dict[str, float] = {}
+    metrics.update(await bench_latency(args.latency_calls))
+    metrics.update(await bench_throughput(args.concurrency, args.throughput_calls))
+    metrics.update(await bench_memory(args.memory_calls))
+    return metrics
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Fewer calls, for a fast smoke run")
+    parser.add_argument("--latency-calls", type=int, default=1000, help="Call pairs per latency measurement")
+    parser.add_argument("--throughput-calls", type=int, default=5000, help="Total calls per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100], help="Concurrent callers")
+    parser.add_argument("--memory-calls", type=int, default=1_000_000, help="Calls for the memory growth run")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative regression")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="Baselines JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baselines")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.latency_calls = 200
+        args.throughput_calls, args.memory_calls = 500, 20_000
+
+    metrics = asyncio.run(run_all(args))
+    for name, value in metrics.items():
+        print(f"{name:<50} {value:>12.2f}")
+
+    if args.update_baseline:
+        with open(args.baselines, "w") as f:
+            json.dump({k: round(v, 2) for k, v in metrics.items()}, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"✓ Baselines written to {args.baselines}")
+        return 0
+
+    if not os.path.exists(args.baselines):
+        print(f"✗ No baselines at {args.baselines}, run with --update-baseline first")
+        return 1
+    with open(args.baselines) as f:
+        baselines = json.load(f)
+
+    failures = compare(metrics, baselines, args.tolerance)
+    if failures:
+        print("✗ Performance regressions:")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print(f"✓ All metrics within {args.tolerance:.0%} of baselines")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
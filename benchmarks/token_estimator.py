@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for PromptTokenEstimator.estimate_batch.
+
+Estimates batches of two-message chat requests (shared system prompt + user message)
+and fails if requests per millisecond fall below the budget. Two cases are measured:
+user messages repeating from a small set (cache hits) and all-unique user messages.
+
+Usage:
+    python benchmarks/token_estimator.py [--requests 10000] [--min-repeated 750] [--min-unique 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_cost_tracker import PromptTokenEstimator  # noqa: E402
+from openai_cost_tracker import token_estimator as _module  # noqa: E402
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant. Answer briefly and to the point."}
+
+
+def make_requests(n: int, unique: bool) -> list:
+    return [
+        [SYSTEM, {"role": "user", "content": f"What is the capital of country number {i if unique else i % 100}?"}]
+        for i in range(n)
+    ]
+
+
+def requests_per_ms(estimator: PromptTokenEstimator, requests: list, runs: int, cold: bool) -> float:
+    """Best of `runs`. With `cold`, the text features cache is cleared before every run."""
+    best = float("inf")
+    for _ in range(runs):
+        if cold:
+            _module._text_features.cache_clear()
+        start = time.perf_counter()
+        estimator.estimate_batch("gpt-4o-mini", requests)
+        best = min(best, time.perf_counter() - start)
+    return len(requests) / best / 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000, help="Requests per batch")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs (best one is taken)")
+    parser.add_argument("--min-repeated", type=float, default=750.0, help="Min requests/ms with repeated messages")
+    parser.add_argument("--min-unique", type=float, default=200.0, help="Min requests/ms with unique messages")
+    args = parser.parse_args()
+
+    estimator = PromptTokenEstimator()
+    repeated = requests_per_ms(estimator, make_requests(args.requests, unique=False), args.runs, cold=False)
+    unique = requests_per_ms(estimator, make_requests(args.requests, unique=True), args.runs, cold=True)
+    print(f"estimate_batch repeated: {repeated:,.0f} req/ms  budget>={args.min_repeated:,.0f}")
+    print(f"estimate_batch unique:   {unique:,.0f} req/ms  budget>={args.min_unique:,.0f}")
+
+    ok = True
+    if repeated < args.min_repeated:
+        print(f"✗ Repeated-messages throughput {repeated:,.0f} req/ms is under budget")
+        ok = False
+    if unique < args.min_unique:
+        print(f"✗ Unique-messages throughput {unique:,.0f} req/ms is under budget")
+        ok = False
+
+    if ok:
+        print("✓ Token estimator throughput within budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,22 +5,69 @@ A Python package for tracking and estimating costs when using OpenAI API.
 Provides cost estimation, usage tracking, and detailed reporting for OpenAI API calls.
 """
 
-from .cost_estimator import CostEstimator, AsyncCostEstimator
-from .schemas import ModelTotals, Totals
-from .constants import PRICES_USD_PER_MLN_TOKEN
-from .utils import _extract_usage_and_model, _calc_cost
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .cost_estimator import CostEstimator, AsyncCostEstimator
+    from .sampling import BaseSampler, RateSampler, ReservoirSampler
+    from .schemas import CallRecord, ModelTotals, Totals, TokenEstimate
+    from .token_estimator import PromptTokenEstimator
+    from .catalog import PriceCatalog, PriceTable
+    from .constants import PRICES_USD_PER_MLN_TOKEN
+    from .utils import _extract_usage_and_model, _calc_cost
+
+# Public names are imported on first access, so `import openai_cost_tracker` stays cheap
+# for short-lived scripts that may never touch the estimators.
+_LAZY_ATTRS = {
+    "CostEstimator": ".cost_estimator",
+    "AsyncCostEstimator": ".cost_estimator",
+    "ModelTotals": ".schemas",
+    "Totals": ".schemas",
+    "TokenEstimate": ".schemas",
+    "CallRecord": ".schemas",
+    "BaseSampler": ".sampling",
+    "RateSampler": ".sampling",
+    "ReservoirSampler": ".sampling",
+    "PromptTokenEstimator": ".token_estimator",
+    "PriceCatalog": ".catalog",
+    "PriceTable": ".catalog",
+    "PRICES_USD_PER_MLN_TOKEN": ".constants",
+    "_extract_usage_and_model": ".utils",
+    "_calc_cost": ".utils",
+}
 
 __version__ = "0.0.1"
 __author__ = "Timur Zhilyaev"
 
 __all__ = [
     "CostEstimator",
-    "AsyncCostEstimator", 
+    "AsyncCostEstimator",
     "ModelTotals",
     "Totals",
+    "TokenEstimate",
+    "CallRecord",
+    "BaseSampler",
+    "RateSampler",
+    "ReservoirSampler",
+    "PromptTokenEstimator",
+    "PriceCatalog",
+    "PriceTable",
     "PRICES_USD_PER_MLN_TOKEN",
     "_extract_usage_and_model",
     "_calc_cost"
 ]
 
 
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,184 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Only calls made of these kwargs can be merged — anything else (extra_headers, timeout, ...)
+# goes straight to the client.
+_BATCHABLE_KWARGS = ("model", "input", "encoding_format", "dimensions", "user")
+
+
+def _single_input(value: Any) -> Optional[Any]:
+    """
+    Returns the single input of an embeddings call (str or list of token ids),
+    or None if the call carries several inputs and should not be coalesced.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], (str, list)):
+        return value[0]
+    if isinstance(value, list) and value and all(isinstance(t, int) for t in value):
+        # a single input already tokenized
+        return value
+    return None
+
+
+def _split_tokens(total: int, weights: List[int]) -> List[int]:
+    """
+    Splits `total` tokens between inputs proportionally to `weights`
+    (largest remainder method), so that the shares always sum up to `total`.
+    The API reports usage only for the whole batch, so the shares themselves are approximate.
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+
+    shares = [total * w // weight_sum for w in weights]
+    remainders = sorted(
+        range(len(weights)),
+        key=lambda i: (total * weights[i] % weight_sum, -i),
+        reverse=True,
+    )
+    for i in remainders[: total - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def _replace(obj: Any, **update: Any) -> Any:
+    """Copy of a pydantic-like SDK object (or dict) with some fields replaced."""
+    if isinstance(obj, dict):
+        return {**obj, **update}
+    copy = getattr(obj, "model_copy", None) or obj.copy
+    return copy(update=update)
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+class _PendingBatch:
+    def __init__(self, create: Callable[..., Awaitable[Any]], common: Dict[str, Any]):
+        self.create = create
+        self.common = common
+        self.inputs: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.on_cancelled: List[Optional[Callable[[Any], None]]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class _EmbeddingsCoalescer:
+    """
+    Gathers concurrent single-input `embeddings.create` calls made within `window` seconds
+    (or until `max_inputs` are collected) into one batched request.
+    Every caller gets back its own response with a single embedding and its share of usage.
+    Shares are split by input length, so each one is an estimate — only their sum matches the billed usage.
+    """
+
+    def __init__(self, window: float = 0.005, max_inputs: int = 256):
+        self._window = window
+        self._max_inputs = max_inputs
+        self._pending: Dict[Tuple, _PendingBatch] = {}
+        # The loop keeps only weak references to tasks — hold them until they finish
+        self._sending: Set[asyncio.Task] = set()
+
+    def accepts(self, kwargs: dict) -> bool:
+        if "model" not in kwargs or "input" not in kwargs:
+            return False
+        if any(k not in _BATCHABLE_KWARGS for k in kwargs):
+            return False
+        return _single_input(kwargs["input"]) is not None
+
+    async def submit(
+        self,
+        create: Callable[..., Awaitable[Any]],
+        kwargs: dict,
+        on_cancelled: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """
+        Queues the call and waits for its share of the batched response.
+        `on_cancelled` gets the share if the caller is cancelled after its input was sent —
+        the input is billed anyway, so it still has to be counted.
+        """
+        single = _single_input(kwargs["input"])
+        common = {k: v for k, v in kwargs.items() if k != "input"}
+        # strings and token arrays can't be mixed in one request
+        key = (isinstance(single, str),) + tuple(sorted((k, repr(v)) for k, v in common.items()))
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch(create, common)
+            loop = asyncio.get_running_loop()
+            batch.timer = loop.call_later(self._window, self._flush, key)
+
+        fut = asyncio.get_running_loop().create_future()
+        batch.inputs.append(single)
+        batch.futures.append(fut)
+        batch.on_cancelled.append(on_cancelled)
+
+        if len(batch.inputs) >= self._max_inputs:
+            self._flush(key)
+
+        return await fut
+
+    def _flush(self, key: Tuple) -> None:
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: _PendingBatch) -> None:
+        # Callers cancelled while waiting for the flush are left out — they must not be billed
+        live = [i for i, fut in enumerate(batch.futures) if not fut.done()]
+        if not live:
+            return
+        inputs = [batch.inputs[i] for i in live]
+        futures = [batch.futures[i] for i in live]
+        on_cancelled = [batch.on_cancelled[i] for i in live]
+
+        logger.debug('sending embeddings batch of %d inputs', len(inputs))
+        try:
+            resp = await batch.create(input=inputs, **batch.common)
+            results = self._split(resp, inputs)
+        except Exception as e:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for fut, res, callback in zip(futures, results, on_cancelled):
+                if not fut.done():
+                    fut.set_result(res)
+                elif fut.cancelled() and callback is not None:
+                    callback(res)
+        finally:
+            # The send task itself was cancelled — don't leave callers waiting forever
+            for fut in futures:
+                if not fut.done():
+                    fut.cancel()
+
+    def _split(self, resp: Any, inputs: List[Any]) -> List[Any]:
+        """Splits a batched response back into one response per input."""
+        data = sorted(_field(resp, "data", []), key=lambda d: _field(d, "index", 0))
+        if len(data) != len(inputs):
+            raise ValueError(f"Expected {len(inputs)} embeddings in batched response, got {len(data)}")
+
+        usage = _field(resp, "usage")
+        weights = [len(i) for i in inputs]
+        if usage is not None:
+            prompt = _split_tokens(int(_field(usage, "prompt_tokens", 0) or 0), weights)
+            total = _split_tokens(int(_field(usage, "total_tokens", 0) or 0), weights)
+
+        results = []
+        for i, item in enumerate(data):
+            update: Dict[str, Any] = {"data": [_replace(item, index=0)]}
+            if usage is not None:
+                update["usage"] = _replace(usage, prompt_tokens=prompt[i], total_tokens=total[i])
+            results.append(_replace(resp, **update))
+        return results
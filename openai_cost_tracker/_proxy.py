@@ -1,7 +1,11 @@
-from typing import Any, Callable
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, Tuple
 import inspect
 import logging
 
+if TYPE_CHECKING:
+    from ._batching import _EmbeddingsCoalescer
+
 logger = logging.getLogger(__name__)
 
 class _ClientProxy:
@@ -19,6 +23,9 @@ class _ClientProxy:
         attr = getattr(self._obj, name)
 
         if callable(attr):
+            # SDK stream helpers (`responses.stream(...)`) return a context manager over the stream
+            stream_helper = name == "stream"
+
             def wrapper(*args, **kwargs):
                 res = attr(*args, **kwargs)
 
@@ -27,12 +34,12 @@ class _ClientProxy:
                     async def _await_and_handle():
                         real = await res
                         self._handle_result(real, kwargs)
-                        return self.__dict__.get("_last_result", real)
+                        return self.__dict__.pop("_last_result", real)
                     return _await_and_handle()
 
                 # sync result
-                self._handle_result(res, kwargs)
-                return self.__dict__.get("_last_result", res)
+                self._handle_result(res, kwargs, stream_helper)
+                return self.__dict__.pop("_last_result", res)
 
             return wrapper
 
@@ -42,13 +49,15 @@ class _ClientProxy:
     def __setattr__(self, name, value):
         return setattr(self._obj, name, value)
 
-    def _handle_result(self, res: Any, call_kwargs: dict):
+    def _handle_result(self, res: Any, call_kwargs: dict, stream_helper: bool = False):
         """
         1) If res is a stream object, wrap it in _StreamProxy and return it outside.
         2) If a regular response, count usage immediately.
         """
-        # stream object is identified by the presence of get_final_response or "stream"
-        if hasattr(res, "get_final_response") or hasattr(res, "__aiter__") or hasattr(res, "__iter__"):
+        # stream object is identified by the presence of get_final_response or "stream".
+        # Responses are pydantic models, which are iterable too — but they always have usage.
+        is_iterable = hasattr(res, "__aiter__") or hasattr(res, "__iter__")
+        if stream_helper or hasattr(res, "get_final_response") or (is_iterable and not hasattr(res, "usage")):
             logger.debug('processing stream')
             # Replace res with the caller (return) — for this we do a trick:
             def on_final(final_resp: Any):
@@ -79,63 +88,141 @@ class _ClientProxy:
         return getattr(self, "_last_result", res)
 
 class _AsyncClientProxy:
-    def __init__(self, obj: Any, on_response: Callable[[Any, dict], None]):
+    def __init__(
+        self,
+        obj: Any,
+        on_response: Callable[[Any, dict], None],
+        coalescer: Optional[_EmbeddingsCoalescer] = None,
+        path: Tuple[str, ...] = (),
+    ):
         self.__dict__["_obj"] = obj
         self.__dict__["_on_resp"] = on_response
+        self.__dict__["_coalescer"] = coalescer
+        self.__dict__["_path"] = path
         
     def __getattr__(self, name: str) -> Any:
         attr = getattr(self._obj, name)
-        logger.debug(f'attr {attr}')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'attr {attr}')
         if callable(attr):
-            async def wrapper(*args, **kwargs):
-                res = await attr(*args, **kwargs)
-                self._handle_result(res, kwargs)
-                return getattr(self, "_last_result", res)
+            coalescer = self._coalescer if self._path + (name,) == ("embeddings", "create") else None
+
+            stream_helper = name == "stream"
+
+            def wrapper(*args, **kwargs):
+                # Single-input embeddings calls are merged into one batched request
+                if coalescer is not None and not args and coalescer.accepts(kwargs):
+                    return self._await_and_handle(
+                        coalescer.submit(attr, kwargs, lambda share: self._on_resp(share, kwargs)), kwargs,
+                    )
+                res = attr(*args, **kwargs)
+                if inspect.isawaitable(res):
+                    return self._await_and_handle(res, kwargs)
+                # SDK stream helpers (`responses.stream(...)`) return an async context manager, not a coroutine
+                if stream_helper:
+                    return _StreamProxy(res, lambda final: self._on_resp(final, kwargs))
+                return res
             return wrapper
-        return _AsyncClientProxy(attr, self._on_resp)
+        return _AsyncClientProxy(attr, self._on_resp, self._coalescer, self._path + (name,))
+
+    async def _await_and_handle(self, pending: Awaitable[Any], call_kwargs: dict) -> Any:
+        res = await pending
+        self._handle_result(res, call_kwargs)
+        return self.__dict__.pop("_last_result", res)
         
     def __setattr__(self, name, value):
         return setattr(self._obj, name, value)
     
     def _handle_result(self, res: Any, call_kwargs: dict):
-        self._on_resp(res, call_kwargs)
+        # AsyncStream has no usage of its own — it is counted from its final chunk/event
+        if hasattr(res, "__aiter__") and not hasattr(res, "usage"):
+            self.__dict__["_last_result"] = _StreamProxy(res, lambda final: self._on_resp(final, call_kwargs))
+        else:
+            self._on_resp(res, call_kwargs)
 
 class _StreamProxy:
     """
     Wrapper over stream objects SDK (both sync and async),
     to catch the final response and usage.
+
+    Usage is taken from the chunk that carries it (chat completions with
+    `stream_options={"include_usage": True}`) or from the `response.completed`
+    event (Responses API). Streams of the SDK helpers (`.stream(...)`) consumed
+    without iterating them are counted from their final response on exit.
+    A stream is counted at most once.
     """
 
-    def __init__(self, stream_obj: Any, on_final: Callable[[Any], None]) -> None:
+    def __init__(self, stream_obj: Any, on_final: Callable[[Any], None], parent: Optional[_StreamProxy] = None) -> None:
         self._s = stream_obj
         self._on_final = on_final
+        self._parent = parent
+        self._child: Optional[_StreamProxy] = None
         self._counted = False
 
     # --- Делегирование атрибутов ---
     def __getattr__(self, name: str) -> Any:
         return getattr(self._s, name)
 
+    def _record(self, final: Any) -> None:
+        if self._counted:
+            return
+        self._counted = True
+        if self._parent is not None:
+            self._parent._counted = True
+        self._on_final(final)
+
+    def _observe(self, item: Any) -> None:
+        if self._counted:
+            return
+        # Field lookup in __dict__: getattr of a missing field on a pydantic
+        # model raises inside pydantic, which is slow for every chunk
+        fields = getattr(item, "__dict__", None) or {}
+        kind = fields.get("type")
+        if kind == "response.completed":
+            self._record(fields["response"])
+            return
+        if kind == "chunk":
+            # chat completions stream helper: the raw chunk is wrapped in an event
+            item = fields["chunk"]
+            fields = getattr(item, "__dict__", None) or {}
+        if fields.get("usage") is not None:
+            self._record(item)
+
+    def _final_getter(self) -> Optional[Callable[[], Any]]:
+        """get_final_response (Responses) / get_final_completion (chat) of the entered stream, if any."""
+        stream = self._child._s if self._child is not None else self._s
+        return getattr(stream, "get_final_response", None) or getattr(stream, "get_final_completion", None)
+
+    def _enter(self, inner: Any) -> _StreamProxy:
+        if inner is self._s:
+            return self
+        self._child = self.__class__(inner, self._on_final, self)
+        return self._child
+
     # --- Итерация (sync) ---
     def __iter__(self):
-        return iter(self._s)
+        for item in self._s:
+            self._observe(item)
+            yield item
 
     # --- Итерация (async) ---
-    def __aiter__(self):
-        return self._s.__aiter__()
+    async def __aiter__(self):
+        async for item in self._s:
+            self._observe(item)
+            yield item
 
     # --- Контекст (sync) ---
     def __enter__(self):
         if hasattr(self._s, "__enter__"):
-            return self.__class__(self._s.__enter__(), self._on_final)
+            return self._enter(self._s.__enter__())
         return self
 
     def __exit__(self, exc_type, exc, tb):
-        # Попытаться считать финальный ответ
+        # Попытаться считать финальный ответ, если он не пришёл при итерации
         try:
-            if hasattr(self._s, "get_final_response"):
-                final = self._s.get_final_response()
-                self._on_final(final)
-                self._counted = True
+            get_final = self._final_getter()
+            if not self._counted and exc_type is None and get_final is not None:
+                self._record(get_final())
         finally:
             if hasattr(self._s, "__exit__"):
                 return self._s.__exit__(exc_type, exc, tb)
@@ -143,16 +230,14 @@ class _StreamProxy:
     # --- Контекст (async) ---
     async def __aenter__(self):
         if hasattr(self._s, "__aenter__"):
-            inner = await self._s.__aenter__()
-            return self.__class__(inner, self._on_final)
+            return self._enter(await self._s.__aenter__())
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
         try:
-            if hasattr(self._s, "get_final_response"):
-                final = await self._maybe_await(self._s.get_final_response())
-                self._on_final(final)
-                self._counted = True
+            get_final = self._final_getter()
+            if not self._counted and exc_type is None and get_final is not None:
+                self._record(await self._maybe_await(get_final()))
         finally:
             if hasattr(self._s, "__aexit__"):
                 return await self._s.__aexit__(exc_type, exc, tb)
@@ -161,5 +246,3 @@ class _StreamProxy:
         if inspect.isawaitable(v):
             return await v
         return v
-
-
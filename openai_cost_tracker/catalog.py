@@ -0,0 +1,231 @@
+from __future__ import annotations
+from bisect import bisect_right
+from collections.abc import Mapping as MappingABC
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_ALWAYS = float("-inf")
+
+# Coarsest mtime resolution in use (FAT); a file modified this recently may change
+# again without its (mtime, size) changing, so its content is compared too.
+_MTIME_GRANULARITY_NS = 2_000_000_000
+
+
+def _parse_effective(value: Any) -> float:
+    """Effective date ("2025-01-31", ISO datetime or unix timestamp) -> unix timestamp."""
+    if value is None:
+        return _ALWAYS
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return float(value.timestamp())
+
+
+class PriceTable(MappingABC):
+    """
+    Immutable, compiled price table: model -> prices (USD per 1M tokens), with effective-date versions.
+    Never mutated after creation, so it can be read from any thread without locks.
+    As a mapping, `table[model]` gives the prices effective now.
+    """
+
+    __slots__ = ("version", "_entries")
+
+    def __init__(self, version: str, entries: Mapping[str, Tuple[Tuple[float, ...], Tuple[Mapping[str, float], ...]]]):
+        self.version = version
+        self._entries = MappingProxyType(dict(entries))
+
+    @classmethod
+    def from_dict(cls, prices: Mapping[str, Any], version: str = "builtin") -> "PriceTable":
+        """
+        Compiles a prices dict. Every model maps either to one price dict
+        (`{"input": .., "cached": .., "output": ..}`) or to a list of them,
+        each with an optional `effective` date.
+        """
+        entries = {}
+        for model, versions in prices.items():
+            if isinstance(versions, Mapping):
+                versions = [versions]
+            compiled: List[Tuple[float, Mapping[str, float]]] = []
+            for v in versions:
+                price = {k: float(p) for k, p in v.items() if k != "effective"}
+                compiled.append((_parse_effective(v.get("effective")), MappingProxyType(price)))
+            compiled.sort(key=lambda e: e[0])
+            entries[model] = (tuple(e[0] for e in compiled), tuple(e[1] for e in compiled))
+        return cls(version, entries)
+
+    def get(self, model: Optional[str], default: Any = None, at: Optional[float] = None) -> Any:
+        """Prices of `model` effective at unix time `at` (now by default)."""
+        entry = self._entries.get(model) if model is not None else None
+        if entry is None:
+            return default
+        effective, prices = entry
+        i = bisect_right(effective, time.time() if at is None else at) - 1
+        return prices[i] if i >= 0 else default
+
+    def __getitem__(self, model: str) -> Mapping[str, float]:
+        prices: Optional[Mapping[str, float]] = self.get(model)
+        if prices is None:
+            raise KeyError(model)
+        return prices
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __contains__(self, model: object) -> bool:
+        return model in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"PriceTable(version={self.version!r}, models={len(self._entries)})"
+
+
+def _parse_file(path: str, raw: bytes, digest: str) -> Dict[str, Any]:
+    data: Dict[str, Any]
+    if path.endswith(".toml"):
+        try:
+            import tomllib  # type: ignore[import-not-found]
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib  # type: ignore[import-not-found, no-redef]
+            except ImportError as e:
+                raise ImportError("TOML price catalogs require Python 3.11+ or the `tomli` package") from e
+        data = tomllib.loads(raw.decode("utf-8"))
+    else:
+        data = json.loads(raw)
+
+    if "prices" not in data:
+        raise ValueError(f"Price catalog {path} has no 'prices' section")
+    # Without an explicit version — identify the catalog by its content
+    data.setdefault("version", digest[:12])
+    return data
+
+
+class PriceCatalog:
+    """
+    Prices loaded from a local JSON/TOML file and reloaded in the background when it changes.
+
+    Catalog file example (JSON):
+    ```json
+    {
+        "version": "2025-08",
+        "prices": {
+            "gpt-4o": [
+                {"input": 5.00, "cached": 2.50, "output": 15.00},
+                {"effective": "2024-08-06", "input": 2.50, "cached": 1.25, "output": 10.00}
+            ],
+            "gpt-4o-mini": {"input": 0.15, "cached": 0.08, "output": 0.60}
+        }
+    }
+    ```
+
+    Every reload compiles a new immutable `PriceTable` and swaps it in with a single
+    reference assignment, so readers (`catalog.table`) never take a lock.
+    A broken file is logged once and ignored — the previous table stays in use
+    until the file changes again.
+    """
+
+    def __init__(self, path: str, poll_interval: Optional[float] = 1.0):
+        self._path = os.fspath(path)
+        self._poll_interval = poll_interval
+        # (mtime, size) and content hash of the file as last read, loaded or not
+        self._stat: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._racy = True
+        self._error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # The first load must succeed — there is nothing to fall back to
+        raw = self._read(force=True)
+        assert raw is not None
+        self.table = self._compile(raw)
+
+        if poll_interval:
+            self.start()
+
+    @property
+    def version(self) -> str:
+        return self.table.version
+
+    def _file_stat(self) -> Tuple[int, int]:
+        st = os.stat(self._path)
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self, force: bool = False) -> Optional[bytes]:
+        """Content of the file, or None if it is the same as on the last read."""
+        stat = self._file_stat()
+        if not force and stat == self._stat and not self._racy:
+            return None
+        with open(self._path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        self._stat = stat
+        self._racy = time.time_ns() - stat[0] < _MTIME_GRANULARITY_NS
+        if not force and digest == self._digest:
+            return None
+        self._digest = digest
+        return raw
+
+    def _compile(self, raw: bytes) -> PriceTable:
+        assert self._digest is not None
+        data = _parse_file(self._path, raw, self._digest)
+        return PriceTable.from_dict(data["prices"], version=str(data["version"]))
+
+    def reload(self, force: bool = False) -> bool:
+        """Reloads the catalog if the file changed. Returns True if a new table was swapped in."""
+        try:
+            raw = self._read(force)
+            if raw is None:
+                return False
+            table = self._compile(raw)
+        except Exception as e:
+            # The failed content is remembered by _read, so it is retried only once it changes
+            error = f'Failed to reload price catalog {self._path}: {e}'
+            if error != self._error:
+                logger.warning(error)
+            self._error = error
+            return False
+        self._error = None
+
+        # Atomic swap: readers see either the old or the new table, never a mix
+        self.table = table
+        logger.debug(f'price catalog {self._path} reloaded, version {table.version}')
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="price-catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self._poll_interval):
+            self.reload()
+
+    def __enter__(self) -> "PriceCatalog":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.stop()
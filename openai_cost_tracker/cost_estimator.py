@@ -1,23 +1,124 @@
 # cost_estimator.py
 from __future__ import annotations
-import asyncio
-from typing import Any, Dict, Optional
-from openai import OpenAI, AsyncOpenAI, Client, AsyncClient
-from decimal import getcontext
+from typing import TYPE_CHECKING, Any, Dict, Optional
+import copy
 import logging
+import time
 
 from ._proxy import _ClientProxy, _AsyncClientProxy
+from .catalog import PriceCatalog, PriceTable
 from .constants import PRICES_USD_PER_MLN_TOKEN
-from .schemas import ModelTotals, Totals
+from .sampling import BaseSampler
+from .schemas import CallRecord, ModelTotals, Totals
+from .token_estimator import PromptTokenEstimator
 from .utils import _extract_usage_and_model, _calc_cost
 from .output.base import BaseOutput
 from .output.simple import SimplePrintOutput
 
-getcontext().prec = 6
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI, Client, AsyncClient
 
 logger = logging.getLogger(__name__)
-    
-class CostEstimator:
+
+
+def _snapshot_request(call_kwargs: dict) -> dict:
+    """
+    Copy of the call kwargs for a sampled CallRecord. Conversation loops keep appending
+    to the same `messages` list, so it (and `input`) is copied as it was when sent.
+    """
+    request = dict(call_kwargs)
+    for key in ("messages", "input"):
+        if key in request:
+            try:
+                request[key] = copy.deepcopy(request[key])
+            except Exception:
+                # e.g. an open file as input — keep the reference rather than fail the call
+                pass
+    return request
+
+
+class _BaseCostEstimator:
+    """Settings, totals and per-response accounting shared by both estimators."""
+
+    def __init__(
+        self,
+        client: Any,
+        custom_prices: Optional[Dict[str, Dict[str, float]]] = None,
+        custom_output: Optional[BaseOutput] = None,
+        price_catalog: Optional[PriceCatalog] = None,
+        token_estimator: Optional[PromptTokenEstimator] = None,
+        sampler: Optional[BaseSampler] = None,
+    ):
+        self._orig = client
+        self._prices = custom_prices or PRICES_USD_PER_MLN_TOKEN
+        self._price_table = PriceTable.from_dict(self._prices, version="custom" if custom_prices else "builtin")
+        self._price_catalog = price_catalog
+        self._token_estimator = token_estimator
+        self._sampler = sampler
+        self.totals = Totals()
+        self._output = custom_output or SimplePrintOutput()
+
+    def _record_response(self, resp: Any, call_kwargs: dict) -> None:
+        """
+        Counts the usage and cost of a response. Runs synchronously in the calling thread
+        (the event loop thread for AsyncCostEstimator), so no other coroutine can
+        interleave with the totals update — no lock or task needed.
+        """
+        # Checked once per call: at high QPS even building debug f-strings is too expensive
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f'on_response {resp} {call_kwargs}')
+        model, in_tok, out_tok, cached_tok, total_tok = _extract_usage_and_model(resp)
+        if debug:
+            logger.debug(f'model {model} in_tok {in_tok} out_tok {out_tok} cached_tok {cached_tok} total_tok {total_tok}')
+
+        # If model is not returned in the response — try to get it from kwargs
+        model = call_kwargs.get("model")
+        if (in_tok + out_tok + total_tok) == 0:
+            return
+        if self._token_estimator is not None and "messages" in call_kwargs:
+            self._token_estimator.observe(model, call_kwargs["messages"], in_tok)
+        # Lock-free: the catalog swaps whole tables, we just take the current one
+        prices = self._price_catalog.table if self._price_catalog is not None else self._price_table
+        cost = _calc_cost(model, in_tok, out_tok, cached_tok, prices)
+        if debug:
+            logger.debug(f'cost {cost} prices version {prices.version}')
+
+        # Unsampled calls stop at should_sample — no record is built for them
+        if self._sampler is not None and self._sampler.should_sample(model or "<unknown>"):
+            self._sampler.add(CallRecord(
+                model=model or "<unknown>",
+                input_tokens=in_tok,
+                output_tokens=out_tok,
+                cached_tokens=cached_tok,
+                total_tokens=total_tok or (in_tok + out_tok),
+                cost_usd=cost,
+                price_version=prices.version,
+                response_id=getattr(resp, "id", None),
+                request=_snapshot_request(call_kwargs),
+                timestamp=time.time(),
+            ))
+
+        m = self.totals.per_model.setdefault(model or "<unknown>", ModelTotals())
+        m.input_tokens += in_tok
+        m.output_tokens += out_tok
+        m.cached_tokens += cached_tok
+        m.total_tokens += total_tok or (in_tok + out_tok)
+        m.cost_usd += cost
+        m.requests += 1
+        m.price_versions[prices.version] = m.price_versions.get(prices.version, 0) + 1
+
+        if debug:
+            logger.debug(f'self.totals {self.totals}')
+            logger.debug(f'm {m}')
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._output.output(self.totals)
+        # Do nothing
+        return False
+
+
+class CostEstimator(_BaseCostEstimator):
     """
     Usage example:
     ```python
@@ -42,46 +143,19 @@ class CostEstimator:
         client: OpenAI | Client,
         custom_prices: Optional[Dict[str, Dict[str, float]]] = None,
         custom_output: Optional[BaseOutput] = None,
+        price_catalog: Optional[PriceCatalog] = None,
+        token_estimator: Optional[PromptTokenEstimator] = None,
+        sampler: Optional[BaseSampler] = None,
     ):
-        self._orig = client
-        self._prices = custom_prices or PRICES_USD_PER_MLN_TOKEN
-        self.totals = Totals()
-        self._output = custom_output or SimplePrintOutput()
-        
+        super().__init__(client, custom_prices, custom_output, price_catalog, token_estimator, sampler)
+
     async def __aenter__(self):
         # Create client proxy
-        def on_response(resp: Any, call_kwargs: dict):
-            logger.debug(f'on_response {resp} {call_kwargs}')
-            model, in_tok, out_tok, cached_tok, total_tok = _extract_usage_and_model(resp)
-            logger.debug(f'model {model} in_tok {in_tok} out_tok {out_tok} cached_tok {cached_tok} total_tok {total_tok}')
-            
-            # If model is not returned in the response — try to get it from kwargs
-            model = call_kwargs.get("model")
-            if (in_tok + out_tok + total_tok) == 0:
-                return
-            cost = _calc_cost(model, in_tok, out_tok, cached_tok)
-            logger.debug(f'cost {cost}')
-            
-            m = self.totals.per_model.setdefault(model or "<unknown>", ModelTotals())
-            m.input_tokens += in_tok
-            m.output_tokens += out_tok
-            m.cached_tokens += cached_tok
-            m.total_tokens += total_tok or (in_tok + out_tok)
-            m.cost_usd += cost
-            
-            logger.debug(f'self.totals {self.totals}')
-            logger.debug(f'm {m}')
-            
-        self._proxy = _ClientProxy(self._orig, on_response)
+        self._proxy = _ClientProxy(self._orig, self._record_response)
         
         return self._proxy
 
-    async def __aexit__(self, exc_type, exc, tb):
-        self._output.output(self.totals)
-        # Do nothing
-        return False
-
-class AsyncCostEstimator:
+class AsyncCostEstimator(_BaseCostEstimator):
     """
     Usage example:
     ```python
@@ -106,59 +180,23 @@ class AsyncCostEstimator:
         client: AsyncOpenAI | AsyncClient,
         custom_prices: Optional[Dict[str, Dict[str, float]]] = None,
         custom_output: Optional[BaseOutput] = None,
+        coalesce_embeddings: bool = False,
+        coalesce_window: float = 0.005,
+        coalesce_max_inputs: int = 256,
+        price_catalog: Optional[PriceCatalog] = None,
+        token_estimator: Optional[PromptTokenEstimator] = None,
+        sampler: Optional[BaseSampler] = None,
     ):
-        self._orig = client
-        self._lock = asyncio.Lock()
-        self.totals = Totals()
-        self._tasks = []
+        super().__init__(client, custom_prices, custom_output, price_catalog, token_estimator, sampler)
         
-        self._prices = custom_prices or PRICES_USD_PER_MLN_TOKEN
-        self._output = custom_output or SimplePrintOutput()
+        # Opt-in: merge concurrent single-input embeddings.create calls into batched requests
+        self._coalescer = None
+        if coalesce_embeddings:
+            from ._batching import _EmbeddingsCoalescer
+            self._coalescer = _EmbeddingsCoalescer(window=coalesce_window, max_inputs=coalesce_max_inputs)
 
     async def __aenter__(self):
         # Create client proxy
-        def on_response(resp: Any, call_kwargs: dict):
-            logger.debug(f'on_response {resp} {call_kwargs}')
-            model, in_tok, out_tok, cached_tok, total_tok = _extract_usage_and_model(resp)
-            logger.debug(f'model {model} in_tok {in_tok} out_tok {out_tok} cached_tok {cached_tok} total_tok {total_tok}')
-            
-            # If model is not returned in the response — try to get it from kwargs
-            model = call_kwargs.get("model")
-            if (in_tok + out_tok + total_tok) == 0:
-                return
-            cost = _calc_cost(model, in_tok, out_tok, cached_tok)
-            logger.debug(f'cost {cost}')
-            
-            # Atomically accumulate
-            async def upd():
-                m = self.totals.per_model.setdefault(model or "<unknown>", ModelTotals())
-                m.input_tokens += in_tok
-                m.output_tokens += out_tok
-                m.cached_tokens += cached_tok
-                m.total_tokens += total_tok or (in_tok + out_tok)
-                m.cost_usd += cost
-                
-                logger.debug(f'self.totals {self.totals}')
-                logger.debug(f'm {m}')
-                
-            # Update under lock, to survive concurrent calls
-            async def _upd_locked():
-                async with self._lock:
-                    await upd()
-                    
-            loop = asyncio.get_running_loop()
-            self._tasks.append(loop.create_task(_upd_locked()))
-
-        # Create client proxy
-        self._proxy = _AsyncClientProxy(self._orig, on_response)
+        self._proxy = _AsyncClientProxy(self._orig, self._record_response, self._coalescer)
         
         return self._proxy
-
-    async def __aexit__(self, exc_type, exc, tb):
-        await asyncio.gather(*self._tasks)
-        self._output.output(self.totals)
-        
-        # Do nothing
-        return False
-
-
@@ -0,0 +1,127 @@
+from __future__ import annotations
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import math
+import random
+
+from .schemas import CallRecord
+
+
+class BaseSampler:
+    """
+    Decides which calls get a detailed `CallRecord` captured.
+    `should_sample` runs for every call and must stay cheap; `add` only for sampled ones.
+    """
+
+    def should_sample(self, model: str) -> bool:
+        raise NotImplementedError()
+
+    def add(self, record: CallRecord) -> None:
+        raise NotImplementedError()
+
+    @property
+    def records(self) -> Dict[str, List[CallRecord]]:
+        raise NotImplementedError()
+
+
+class RateSampler(BaseSampler):
+    """
+    Captures each call with probability `rate`, keeping at most `max_records` latest records per model.
+    Draws the gap to the next sampled call (geometric distribution) instead of a random number per call,
+    so unsampled calls only decrement a counter.
+    """
+
+    def __init__(self, rate: float, max_records: Optional[int] = 10_000, seed: Optional[int] = None):
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"rate must be within [0, 1], got {rate}")
+        self._rate = rate
+        self._max_records = max_records
+        self._random = random.Random(seed)
+        self._skip: Dict[str, int] = {}
+        self._records: Dict[str, Deque[CallRecord]] = {}
+
+    def _next_skip(self) -> int:
+        if self._rate >= 1.0:
+            return 0
+        if self._rate <= 0.0:
+            return -1
+        # number of calls to skip before the next sampled one
+        return int(math.log(1.0 - self._random.random()) / math.log(1.0 - self._rate))
+
+    def should_sample(self, model: str) -> bool:
+        skip = self._skip.get(model)
+        if skip is None:
+            skip = self._next_skip()
+        if skip > 0:
+            self._skip[model] = skip - 1
+            return False
+        self._skip[model] = self._next_skip()
+        return skip == 0
+
+    def add(self, record: CallRecord) -> None:
+        records = self._records.get(record.model)
+        if records is None:
+            records = self._records[record.model] = deque(maxlen=self._max_records)
+        records.append(record)
+
+    @property
+    def records(self) -> Dict[str, List[CallRecord]]:
+        return {model: list(records) for model, records in self._records.items()}
+
+
+class _Reservoir:
+    __slots__ = ("items", "seen", "next_index", "w")
+
+    def __init__(self) -> None:
+        self.items: List[CallRecord] = []
+        self.seen = 0
+        self.next_index = 0
+        self.w = 1.0
+
+
+class ReservoirSampler(BaseSampler):
+    """
+    Keeps a uniform random sample of `size` calls per model, however many calls there are.
+    Uses Algorithm L: the index of the next accepted call is computed ahead,
+    so unsampled calls only increment a counter.
+    """
+
+    def __init__(self, size: int = 100, seed: Optional[int] = None):
+        if size <= 0:
+            raise ValueError(f"size must be positive, got {size}")
+        self._size = size
+        self._random = random.Random(seed)
+        self._reservoirs: Dict[str, _Reservoir] = {}
+
+    def _advance(self, r: _Reservoir) -> None:
+        rnd = self._random.random
+        r.w *= math.exp(math.log(1.0 - rnd()) / self._size)
+        r.next_index += int(math.log(1.0 - rnd()) / math.log(1.0 - r.w)) + 1
+
+    def should_sample(self, model: str) -> bool:
+        r = self._reservoirs.get(model)
+        if r is None:
+            r = self._reservoirs[model] = _Reservoir()
+        r.seen += 1
+        if r.seen <= self._size:
+            if r.seen == self._size:
+                r.next_index = self._size
+                self._advance(r)
+            return True
+        if r.seen < r.next_index:
+            return False
+        self._advance(r)
+        return True
+
+    def add(self, record: CallRecord) -> None:
+        r = self._reservoirs.get(record.model)
+        if r is None:
+            r = self._reservoirs[record.model] = _Reservoir()
+        if len(r.items) < self._size:
+            r.items.append(record)
+        else:
+            r.items[self._random.randrange(self._size)] = record
+
+    @property
+    def records(self) -> Dict[str, List[CallRecord]]:
+        return {model: list(r.items) for model, r in self._reservoirs.items()}
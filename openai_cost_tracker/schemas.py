@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from decimal import Decimal
-from typing import Dict
+from typing import Any, Dict, List, Optional
 
 
 @dataclass
@@ -10,6 +10,9 @@ class ModelTotals:
     cached_tokens: int = 0
     total_tokens: int = 0
     cost_usd: Decimal = Decimal("0.0")
+    requests: int = 0
+    # price catalog version -> number of calls priced with it
+    price_versions: Dict[str, int] = field(default_factory=dict)
 
 
 @dataclass
@@ -36,4 +39,31 @@ class Totals:
     def total_tokens(self) -> int:
         return sum(m.total_tokens for m in self.per_model.values())
 
+    @property
+    def requests(self) -> int:
+        return sum(m.requests for m in self.per_model.values())
+
+
+@dataclass
+class TokenEstimate:
+    tokens: int = 0
+    low: int = 0
+    high: int = 0
+    per_request: List[int] = field(default_factory=list)
+    # number of real responses the model was calibrated on
+    observations: int = 0
+
 
+@dataclass
+class CallRecord:
+    """Full detail of a single sampled call."""
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: Decimal = Decimal("0.0")
+    price_version: Optional[str] = None
+    response_id: Optional[str] = None
+    request: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = 0.0
@@ -0,0 +1,212 @@
+from __future__ import annotations
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import math
+import threading
+
+from .schemas import TokenEstimate
+from .utils import _calc_cost
+
+# Features of a request: (chars, extra utf-8 bytes, words, messages, 1)
+_N_FEATURES = 5
+
+# Before any calibration: ~4 chars per token for ASCII text, non-ASCII text is denser,
+# plus per-message and per-request overhead of the chat format.
+_PRIOR_WEIGHTS = (0.25, 0.25, 0.0, 4.0, 3.0)
+
+# Relative error bounds (actual / estimated) while a model has too few observations
+_UNCALIBRATED_BOUNDS = (0.5, 2.0)
+_MIN_OBSERVATIONS = 8
+
+
+@lru_cache(maxsize=4096)
+def _text_features(text: str) -> Tuple[int, int, int]:
+    """(chars, extra utf-8 bytes, words) of a text. Cached — system prompts repeat a lot."""
+    chars = len(text)
+    extra_bytes = 0 if text.isascii() else len(text.encode("utf-8")) - chars
+    return chars, extra_bytes, len(text.split())
+
+
+def _message_texts(message: Any) -> Iterable[str]:
+    if not isinstance(message, Mapping):
+        message = getattr(message, "__dict__", {})
+
+    content = message.get("content")
+    if isinstance(content, str):
+        yield content
+    elif isinstance(content, list):
+        for part in content:
+            text = part.get("text") if isinstance(part, Mapping) else getattr(part, "text", None)
+            if isinstance(text, str):
+                yield text
+
+    name = message.get("name")
+    if isinstance(name, str):
+        yield name
+
+    for call in message.get("tool_calls") or ():
+        function = call.get("function") if isinstance(call, Mapping) else getattr(call, "function", None)
+        if isinstance(function, Mapping):
+            yield function.get("name") or ""
+            yield function.get("arguments") or ""
+
+
+def _request_features(messages: Sequence[Any]) -> Tuple[float, ...]:
+    chars = extra_bytes = words = 0
+    for message in messages:
+        for text in _message_texts(message):
+            c, b, w = _text_features(text)
+            chars += c
+            extra_bytes += b
+            words += w
+    return (chars, extra_bytes, words, len(messages), 1.0)
+
+
+class _ModelCalibration:
+    """
+    Per-model linear model tokens = w·x, fitted online with recursive least squares.
+    `weights` and `bounds` are replaced as whole tuples, so readers never see a half-updated state.
+    """
+
+    def __init__(self, prior: Sequence[float] = _PRIOR_WEIGHTS, confidence: float = 1.0):
+        self.weights: Tuple[float, ...] = tuple(prior)
+        self.bounds: Tuple[float, float] = _UNCALIBRATED_BOUNDS
+        self.observations = 0
+        self._p = [[confidence if i == j else 0.0 for j in range(_N_FEATURES)] for i in range(_N_FEATURES)]
+        # EWMA of actual/estimated ratio and its variance
+        self._ratio_mean = 1.0
+        self._ratio_var = 0.0
+
+    def update(self, x: Sequence[float], actual: int, alpha: float) -> None:
+        w = self.weights
+        predicted = sum(wi * xi for wi, xi in zip(w, x))
+
+        # Error statistics are taken before the update — that's the error estimates actually have
+        if predicted > 0:
+            ratio = actual / predicted
+            diff = ratio - self._ratio_mean
+            self._ratio_mean += alpha * diff
+            self._ratio_var = (1 - alpha) * (self._ratio_var + alpha * diff * diff)
+
+        p = self._p
+        px = [sum(p[i][j] * x[j] for j in range(_N_FEATURES)) for i in range(_N_FEATURES)]
+        denom = 1.0 + sum(x[i] * px[i] for i in range(_N_FEATURES))
+        gain = [v / denom for v in px]
+        err = actual - predicted
+        for i in range(_N_FEATURES):
+            row = p[i]
+            for j in range(_N_FEATURES):
+                row[j] -= gain[i] * px[j]
+
+        self.observations += 1
+        self.weights = tuple(wi + gi * err for wi, gi in zip(w, gain))
+        if self.observations >= _MIN_OBSERVATIONS:
+            spread = 2 * math.sqrt(self._ratio_var)
+            self.bounds = (max(0.0, self._ratio_mean - spread), self._ratio_mean + spread)
+
+
+class PromptTokenEstimator:
+    """
+    Fast local forecast of input tokens for `chat.completions.create` calls, without a tokenizer.
+
+    Messages are turned into character/byte/word features, which are mapped to tokens by
+    a per-model linear model. Pass the estimator to `CostEstimator`/`AsyncCostEstimator`
+    (`token_estimator=`) and it is calibrated online from the `usage` of every chat response.
+
+    Usage example:
+    ```python
+    token_estimator = PromptTokenEstimator()
+    async with AsyncCostEstimator(client, token_estimator=token_estimator) as estimator:
+        ...
+    forecast = token_estimator.estimate("gpt-4o-mini", messages)
+    forecast.tokens, forecast.low, forecast.high
+    ```
+    """
+
+    def __init__(self, alpha: float = 0.05, prior: Sequence[float] = _PRIOR_WEIGHTS):
+        self._alpha = alpha
+        self._prior = tuple(prior)
+        self._models: Dict[str, _ModelCalibration] = {}
+        self._default = _ModelCalibration(self._prior)
+        self._lock = threading.Lock()
+
+    def _calibration(self, model: Optional[str]) -> _ModelCalibration:
+        return self._models.get(model or "", self._default)
+
+    def observe(self, model: Optional[str], messages: Sequence[Any], input_tokens: int) -> None:
+        """Calibrates the model with the actual input tokens of a request."""
+        if not model or input_tokens <= 0 or not messages:
+            return
+        x = _request_features(messages)
+        with self._lock:
+            calibration = self._models.get(model)
+            if calibration is None:
+                calibration = self._models[model] = _ModelCalibration(self._prior)
+            calibration.update(x, input_tokens, self._alpha)
+
+    def estimate(self, model: Optional[str], messages: Sequence[Any]) -> TokenEstimate:
+        """Estimated input tokens of a single request, with error bounds."""
+        return self.estimate_batch(model, [messages])
+
+    def estimate_batch(self, model: Optional[str], requests: Iterable[Sequence[Any]]) -> TokenEstimate:
+        """
+        Estimated input tokens of many requests to the same model.
+        `tokens` is the total, `per_request` the estimate of every request.
+        """
+        calibration = self._calibration(model)
+        w0, w1, w2, w3, w4 = calibration.weights
+        low, high = calibration.bounds
+        features = _text_features
+
+        # Tokens of every distinct message text (including per-message overhead) for this batch:
+        # repeated system prompts and messages cost a single dict lookup.
+        weighted: Dict[str, float] = {}
+        get = weighted.get
+
+        per_request: List[int] = []
+        append = per_request.append
+        for messages in requests:
+            tokens = w4
+            for message in messages:
+                # Fast path for the common {"role": ..., "content": "..."} message
+                content = message.get("content") if type(message) is dict and len(message) == 2 else None
+                if type(content) is str:
+                    t = get(content)
+                    if t is None:
+                        c, b, wd = features(content)
+                        t = weighted[content] = w0 * c + w1 * b + w2 * wd + w3
+                else:
+                    t = w3
+                    for text in _message_texts(message):
+                        c, b, wd = features(text)
+                        t += w0 * c + w1 * b + w2 * wd
+                tokens += t
+            append(round(tokens) if tokens > 0 else 0)
+
+        total = sum(per_request)
+        return TokenEstimate(
+            tokens=total,
+            low=math.floor(total * low),
+            high=math.ceil(total * high),
+            per_request=per_request,
+            observations=calibration.observations,
+        )
+
+    def estimate_cost(
+        self,
+        model: str,
+        messages: Sequence[Any],
+        output_tokens: int = 0,
+        prices: Optional[Mapping[str, Mapping[str, float]]] = None,
+    ) -> Tuple[Decimal, Decimal]:
+        """Forecast (low, high) cost of a request in USD, given the expected number of output tokens."""
+        estimate = self.estimate(model, messages)
+        return (
+            _calc_cost(model, estimate.low, output_tokens, 0, prices),
+            _calc_cost(model, estimate.high, output_tokens, 0, prices),
+        )
+
+    def error_bounds(self, model: Optional[str]) -> Tuple[float, float]:
+        """Observed bounds of actual/estimated tokens ratio for the model (mean ± 2σ)."""
+        return self._calibration(model).bounds
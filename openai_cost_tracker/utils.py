@@ -1,9 +1,17 @@
-from typing import Any, Optional, Tuple
-from decimal import Decimal
-from openai.types.chat.chat_completion import ChatCompletion
-from openai.types.responses import Response
+from __future__ import annotations
+from typing import TYPE_CHECKING, Mapping, Optional, Tuple
+from decimal import Context, Decimal
 from .constants import PRICES_USD_PER_MLN_TOKEN
 
+# Costs are computed with 6 significant digits in a local context,
+# so the result doesn't depend on the caller's global decimal settings.
+_COST_CONTEXT = Context(prec=6)
+
+if TYPE_CHECKING:
+    # Only used in annotations — importing the SDK types costs hundreds of ms at startup
+    from openai.types.chat.chat_completion import ChatCompletion
+    from openai.types.responses import Response
+
 def _extract_usage_and_model(resp: ChatCompletion | Response) -> Tuple[Optional[str], int, int, int, int]:
     """
     Пытается вытащить (model, in, out, total) из ответа SDK.
@@ -19,7 +27,7 @@ def _extract_usage_and_model(resp: ChatCompletion | Response) -> Tuple[Optional[
         model = resp.get("model", model)
         usage = resp.get("usage")
 
-    in_tok = out_tok = total_tok = 0
+    in_tok = out_tok = cached_tok = total_tok = 0
     if usage:
         # Responses API
         if hasattr(usage, "input_tokens") or (isinstance(usage, dict) and "input_tokens" in usage):
@@ -41,10 +49,17 @@ def _extract_usage_and_model(resp: ChatCompletion | Response) -> Tuple[Optional[
     return model, in_tok, out_tok, cached_tok, total_tok
 
 
-def _calc_cost(model: Optional[str], in_tok: int, out_tok: int, cached_tok: int) -> Decimal:
+def _calc_cost(
+    model: Optional[str],
+    in_tok: int,
+    out_tok: int,
+    cached_tok: int,
+    prices: Optional[Mapping[str, Mapping[str, float]]] = None,
+) -> Decimal:
     if not model:
         return Decimal("0.0")
-    price = PRICES_USD_PER_MLN_TOKEN.get(model)
+    # prices: dict or compiled PriceTable, USD per 1M tokens
+    price = (PRICES_USD_PER_MLN_TOKEN if prices is None else prices).get(model)
     if not price:
         # Неизвестная модель — считаем как 0, но можно логировать/кидать warning.
         return Decimal("0.0")
@@ -52,6 +67,9 @@ def _calc_cost(model: Optional[str], in_tok: int, out_tok: int, cached_tok: int)
     # Convert to USD per token
     price = {k: (v / 1_000_000) for k, v in price.items()}
     
-    return Decimal(in_tok) * Decimal(price.get("input", 0.0)) + Decimal(out_tok) * Decimal(price.get("output", 0.0)) + Decimal(cached_tok) * Decimal(price.get("cached", 0.0))
+    ctx = _COST_CONTEXT
+    cost = ctx.multiply(Decimal(in_tok), Decimal(price.get("input", 0.0)))
+    cost = ctx.add(cost, ctx.multiply(Decimal(out_tok), Decimal(price.get("output", 0.0))))
+    return ctx.add(cost, ctx.multiply(Decimal(cached_tok), Decimal(price.get("cached", 0.0))))
 
 
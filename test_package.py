@@ -2,6 +2,65 @@
 """
 Simple test script to verify the package can be imported correctly.
 """
+import asyncio
+import inspect
+from types import SimpleNamespace
+
+from openai_cost_tracker.output.base import BaseOutput
+
+
+class NoOutput(BaseOutput):
+    """Output that prints nothing — keeps the test log readable."""
+
+    def output(self, totals):
+        pass
+
+
+class FakeResource:
+    """SDK resource whose `create` returns `respond(**kwargs)` — awaitable for async clients."""
+
+    def __init__(self, respond, is_async=False):
+        self._respond = respond
+        self._is_async = is_async
+
+    def create(self, **kwargs):
+        if not self._is_async:
+            return self._respond(**kwargs)
+
+        async def _create():
+            # yield to the loop like real I/O would
+            await asyncio.sleep(0)
+            res = self._respond(**kwargs)
+            return await res if inspect.isawaitable(res) else res
+        return _create()
+
+
+def fake_client(chat=None, responses=None, embeddings=None):
+    """Client with the given FakeResources at chat.completions, responses and embeddings."""
+    return SimpleNamespace(chat=SimpleNamespace(completions=chat), responses=responses, embeddings=embeddings)
+
+
+def chat_completion(model="gpt-4o-mini", prompt_tokens=3, completion_tokens=2):
+    from openai.types.chat.chat_completion import ChatCompletion
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": model, "choices": [],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    })
+
+
+def embedding_response(model, inputs, prompt_tokens=10):
+    from openai.types import CreateEmbeddingResponse
+    return CreateEmbeddingResponse.model_validate({
+        "object": "list",
+        "model": model,
+        "data": [{"object": "embedding", "index": i, "embedding": [float(i)]} for i in range(len(inputs))],
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    })
+
 
 def test_imports():
     """Test that all main components can be imported."""
@@ -39,6 +98,515 @@ def test_schemas():
         print(f"✗ Schema test failed: {e}")
         return False
 
+def test_embeddings_coalescing():
+    """Test that concurrent single-input embeddings calls are merged and the callers' usage shares sum up to the batch usage."""
+    try:
+        from openai_cost_tracker import AsyncCostEstimator
+
+        calls = []
+
+        def respond(model, input):
+            calls.append(input)
+            return embedding_response(model, input)
+
+        async def run():
+            client = fake_client(embeddings=FakeResource(respond, is_async=True))
+            estimator = AsyncCostEstimator(client, custom_output=NoOutput(), coalesce_embeddings=True)
+            async with estimator as proxy:
+                results = await asyncio.gather(*(
+                    proxy.embeddings.create(model="text-embedding-3-small", input=text)
+                    for text in ["a", "bb", "ccc"]
+                ))
+            return estimator, results
+
+        estimator, results = asyncio.run(run())
+        assert calls == [["a", "bb", "ccc"]], f"calls not merged: {calls}"
+        assert [r.data[0].embedding for r in results] == [[0.0], [1.0], [2.0]], "embeddings mixed up"
+        assert sum(r.usage.prompt_tokens for r in results) == 10, "shares don't sum up to the batch usage"
+        assert not estimator._coalescer._sending, "send tasks left behind"
+        assert estimator.totals.per_model["text-embedding-3-small"].input_tokens == 10, "batch usage not counted"
+        print(f"✓ Embeddings coalesced: {[r.usage.prompt_tokens for r in results]}")
+        return True
+    except Exception as e:
+        print(f"✗ Embeddings coalescing test failed: {e!r}")
+        return False
+
+def test_embeddings_coalescing_cancellation():
+    """Test that cancelled callers are neither billed nor lost, and a cancelled send doesn't hang callers."""
+    try:
+        from openai_cost_tracker import AsyncCostEstimator
+
+        calls = []
+        release = None
+
+        async def respond(model, input):
+            calls.append(input)
+            await release.wait()
+            return embedding_response(model, input)
+
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            client = fake_client(embeddings=FakeResource(respond, is_async=True))
+            estimator = AsyncCostEstimator(client, custom_output=NoOutput(), coalesce_embeddings=True)
+            async with estimator as proxy:
+                def create(text):
+                    return asyncio.ensure_future(proxy.embeddings.create(model="text-embedding-3-small", input=text))
+
+                # Cancelled before the flush: its input is not sent
+                tasks = [create(text) for text in ["a", "bb", "ccc"]]
+                await asyncio.sleep(0)
+                tasks[1].cancel()
+                while not calls:
+                    await asyncio.sleep(0.001)
+                # Cancelled after the send: its share is still counted
+                tasks[2].cancel()
+                release.set()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                sent = list(calls)
+
+                # The send task itself cancelled: callers are cancelled, not left waiting
+                release.clear()
+                calls.clear()
+                hung = create("dddd")
+                while not calls:
+                    await asyncio.sleep(0.001)
+                for task in list(estimator._coalescer._sending):
+                    task.cancel()
+                done, _ = await asyncio.wait([hung], timeout=1.0)
+            return estimator, sent, done, hung
+
+        estimator, sent, done, hung = asyncio.run(run())
+        if sent != [["a", "ccc"]]:
+            print(f"✗ Cancelled caller was sent: {sent}")
+            return False
+        if estimator.totals.per_model["text-embedding-3-small"].input_tokens != 10:
+            print(f"✗ Batch usage not fully counted: {estimator.totals}")
+            return False
+        if hung not in done or not hung.cancelled():
+            print("✗ Caller hangs after the send task was cancelled")
+            return False
+        print("✓ Coalesced embeddings handle cancellation")
+        return True
+    except Exception as e:
+        print(f"✗ Coalescing cancellation test failed: {e!r}")
+        return False
+
+def test_lazy_imports():
+    """Test that importing the package doesn't pull in openai or asyncio."""
+    try:
+        import subprocess
+        import sys
+
+        code = "import sys, openai_cost_tracker; print(sorted(m for m in ('openai', 'asyncio') if m in sys.modules))"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        assert out.strip() == "[]", f"imported eagerly: {out.strip()}"
+
+        import openai_cost_tracker
+        assert openai_cost_tracker.CostEstimator.__name__ == "CostEstimator", "lazy attribute not resolved"
+        print("✓ Heavy dependencies are imported lazily")
+        return True
+    except Exception as e:
+        print(f"✗ Lazy imports test failed: {e!r}")
+        return False
+
+def test_price_catalog():
+    """Test loading, effective dates and hot reload of an external price catalog."""
+    try:
+        import json
+        import os
+        import tempfile
+        from decimal import Decimal
+        from openai_cost_tracker import PriceCatalog, _calc_cost
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "prices.json")
+            with open(path, "w") as f:
+                json.dump({"version": "v1", "prices": {"gpt-4o": [
+                    {"input": 5.0, "output": 15.0},
+                    {"effective": "2024-08-06", "input": 2.5, "output": 10.0},
+                ]}}, f)
+
+            catalog = PriceCatalog(path, poll_interval=None)
+            assert catalog.version == "v1", f"version {catalog.version}"
+            assert catalog.table.get("gpt-4o", at=0)["input"] == 5.0, "wrong price before the effective date"
+            assert catalog.table.get("gpt-4o")["input"] == 2.5, "wrong current price"
+            cost = _calc_cost("gpt-4o", 1_000_000, 0, 0, catalog.table)
+            assert cost.quantize(Decimal("0.000001")) == Decimal("2.5"), f"cost {cost}"
+
+            old_table = catalog.table
+            with open(path, "w") as f:
+                json.dump({"prices": {"gpt-4o": {"input": 1.0, "output": 4.0}}}, f)
+            os.utime(path, ns=(0, 0))
+            assert catalog.reload(), "changed catalog not reloaded"
+            assert catalog.table.get("gpt-4o")["input"] == 1.0, "new prices not used"
+            assert catalog.version != "v1", "version not derived from content"
+            assert old_table.get("gpt-4o")["input"] == 2.5, "old table mutated"
+
+            with open(path, "w") as f:
+                f.write("{broken")
+            assert not catalog.reload(force=True), "broken catalog reported as reloaded"
+            assert catalog.table.get("gpt-4o")["input"] == 1.0, "broken catalog replaced the table"
+
+        print(f"✓ Price catalog reloaded: {catalog.table}")
+        return True
+    except Exception as e:
+        print(f"✗ Price catalog test failed: {e!r}")
+        return False
+
+def test_price_catalog_change_detection():
+    """Test that a broken catalog is logged once, and a same-size edit with the same mtime is picked up."""
+    try:
+        import json
+        import logging
+        import os
+        import tempfile
+        import time
+        from openai_cost_tracker import PriceCatalog
+
+        warnings = []
+
+        class Collect(logging.Handler):
+            def emit(self, record):
+                warnings.append(record.getMessage())
+
+        handler = Collect(logging.WARNING)
+        logging.getLogger("openai_cost_tracker.catalog").addHandler(handler)
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "prices.json")
+
+                def write(input_price, mtime_ns):
+                    with open(path, "w") as f:
+                        json.dump({"prices": {"gpt-4o": {"input": input_price, "output": 4.0}}}, f)
+                    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+                # Same size, same (recent) mtime, different content — as on a filesystem with coarse mtimes
+                mtime_ns = time.time_ns()
+                write(1.0, mtime_ns)
+                catalog = PriceCatalog(path, poll_interval=None)
+                write(2.0, mtime_ns)
+                if not catalog.reload() or catalog.table.get("gpt-4o")["input"] != 2.0:
+                    print("✗ Same-size edit with unchanged mtime was missed")
+                    return False
+
+                with open(path, "w") as f:
+                    f.write("{broken")
+                reloads = [catalog.reload() for _ in range(5)]
+                if any(reloads) or len(warnings) != 1:
+                    print(f"✗ Broken catalog reloaded {reloads}, warnings: {warnings}")
+                    return False
+
+                write(3.0, 0)
+                if not catalog.reload() or catalog.table.get("gpt-4o")["input"] != 3.0:
+                    print("✗ Fixed catalog was not reloaded")
+                    return False
+        finally:
+            logging.getLogger("openai_cost_tracker.catalog").removeHandler(handler)
+
+        print("✓ Price catalog changes detected, broken file logged once")
+        return True
+    except Exception as e:
+        print(f"✗ Price catalog change detection test failed: {e}")
+        return False
+
+def test_prompt_token_estimator():
+    """Test that the prompt token estimator calibrates from observed usage."""
+    try:
+        from openai_cost_tracker import PromptTokenEstimator
+
+        estimator = PromptTokenEstimator()
+        system = {"role": "system", "content": "You are a helpful assistant."}
+        requests = [[system, {"role": "user", "content": "word " * n}] for n in range(10, 110)]
+
+        def actual(messages):
+            return sum(len(m["content"]) for m in messages) // 2 + 10
+
+        uncalibrated = estimator.estimate("gpt-4o-mini", requests[0])
+        assert uncalibrated.observations == 0, "fresh estimator has observations"
+        assert (uncalibrated.low, uncalibrated.high) == (uncalibrated.tokens // 2, uncalibrated.tokens * 2), \
+            "wrong uncalibrated bounds"
+
+        for messages in requests:
+            estimator.observe("gpt-4o-mini", messages, actual(messages))
+
+        batch = estimator.estimate_batch("gpt-4o-mini", requests)
+        expected = sum(actual(m) for m in requests)
+        assert len(batch.per_request) == len(requests), "per-request estimates missing"
+        assert abs(batch.tokens - expected) / expected < 0.02, f"estimate {batch.tokens} vs actual {expected}"
+        assert batch.low <= expected <= batch.high, f"actual {expected} outside {batch.low}..{batch.high}"
+        print(f"✓ Prompt tokens estimated: {batch.tokens} (actual {expected}, bounds {batch.low}..{batch.high})")
+        return True
+    except Exception as e:
+        print(f"✗ Prompt token estimator test failed: {e!r}")
+        return False
+
+def test_sampling():
+    """Test that samplers capture detail for a subset of calls while totals stay exact."""
+    try:
+        from openai_cost_tracker import AsyncCostEstimator, RateSampler, ReservoirSampler
+
+        def client():
+            return fake_client(chat=FakeResource(lambda model, messages: chat_completion(model), is_async=True))
+
+        async def run(sampler, calls):
+            estimator = AsyncCostEstimator(client(), custom_output=NoOutput(), sampler=sampler)
+            async with estimator as proxy:
+                for _ in range(calls):
+                    await proxy.chat.completions.create(model="gpt-4o-mini", messages=[])
+            return estimator
+
+        reservoir = ReservoirSampler(size=20, seed=1)
+        estimator = asyncio.run(run(reservoir, 2000))
+        records = reservoir.records["gpt-4o-mini"]
+        assert len(records) == 20, f"reservoir kept {len(records)} records"
+        assert records[0].response_id == "chatcmpl-1" and records[0].request["model"] == "gpt-4o-mini", \
+            f"wrong record {records[0]}"
+        assert estimator.totals.requests == 2000, f"counted {estimator.totals.requests} of 2000 calls"
+        assert estimator.totals.input_tokens == 6000, "sampling changed the totals"
+
+        rate = RateSampler(rate=0.1, seed=1)
+        asyncio.run(run(rate, 2000))
+        assert 120 < len(rate.records["gpt-4o-mini"]) < 280, f"rate 0.1 kept {len(rate.records['gpt-4o-mini'])}"
+
+        # The request is captured as sent, not as the conversation list grows afterwards
+        async def conversation(sampler):
+            async with AsyncCostEstimator(client(), custom_output=NoOutput(), sampler=sampler) as proxy:
+                messages = [{"role": "user", "content": "Hi"}]
+                for _ in range(3):
+                    await proxy.chat.completions.create(model="gpt-4o-mini", messages=messages)
+                    messages.append({"role": "assistant", "content": "Hello"})
+
+        every = RateSampler(rate=1.0)
+        asyncio.run(conversation(every))
+        lengths = [len(r.request["messages"]) for r in every.records["gpt-4o-mini"]]
+        assert lengths == [1, 2, 3], f"captured requests changed afterwards: {lengths}"
+
+        print(f"✓ Sampled {len(records)} of 2000 calls (reservoir), {len(rate.records['gpt-4o-mini'])} (rate 0.1)")
+        return True
+    except Exception as e:
+        print(f"✗ Sampling test failed: {e!r}")
+        return False
+
+def test_sync_proxy_counts_responses():
+    """Test that the sync proxy counts regular (pydantic, iterable) responses."""
+    try:
+        from openai_cost_tracker import CostEstimator
+
+        completion = chat_completion()
+
+        async def run():
+            estimator = CostEstimator(fake_client(chat=FakeResource(lambda **kwargs: completion)), custom_output=NoOutput())
+            async with estimator as proxy:
+                result = proxy.chat.completions.create(model="gpt-4o-mini", messages=[])
+            return estimator, result
+
+        estimator, result = asyncio.run(run())
+        assert result is completion, "proxy replaced the response"
+        assert estimator.totals.requests == 1, f"counted {estimator.totals.requests} of 1 calls"
+        assert estimator.totals.total_tokens == 5, f"counted {estimator.totals.total_tokens} of 5 tokens"
+        print(f"✓ Sync proxy counted: {estimator.totals.per_model['gpt-4o-mini']}")
+        return True
+    except Exception as e:
+        print(f"✗ Sync proxy test failed: {e!r}")
+        return False
+
+def test_response_without_usage():
+    """Test that responses without usage (e.g. streams) are skipped instead of raising."""
+    try:
+        from openai_cost_tracker import _extract_usage_and_model
+
+        stream = SimpleNamespace(model="gpt-4o-mini")
+        assert _extract_usage_and_model(stream) == ("gpt-4o-mini", 0, 0, 0, 0), "object without usage"
+        assert _extract_usage_and_model({"model": "gpt-4o-mini"}) == ("gpt-4o-mini", 0, 0, 0, 0), "dict without usage"
+        print("✓ Response without usage skipped")
+        return True
+    except Exception as e:
+        print(f"✗ Response without usage test failed: {e!r}")
+        return False
+
+
+def test_async_totals_updated_inline():
+    """Test that AsyncCostEstimator updates totals right in on_response, without per-call tasks."""
+    try:
+        from openai_cost_tracker import AsyncCostEstimator
+
+        completion = chat_completion()
+
+        async def run():
+            client = fake_client(chat=FakeResource(lambda **kwargs: completion, is_async=True))
+            estimator = AsyncCostEstimator(client, custom_output=NoOutput())
+            async with estimator as proxy:
+                tasks_before = len(asyncio.all_tasks())
+                for _ in range(100):
+                    await proxy.chat.completions.create(model="gpt-4o-mini", messages=[])
+                # counted immediately, nothing left pending on the loop
+                counted = estimator.totals.requests
+                tasks_after = len(asyncio.all_tasks())
+            return counted, tasks_before, tasks_after
+
+        counted, tasks_before, tasks_after = asyncio.run(run())
+        assert counted == 100, f"counted {counted} of 100 calls"
+        assert tasks_after == tasks_before, f"{tasks_after - tasks_before} tasks left pending"
+        print("✓ Async totals updated inline")
+        return True
+    except Exception as e:
+        print(f"✗ Async totals test failed: {e!r}")
+        return False
+
+
+def test_streams_counted():
+    """Test that streams are counted once, from the usage chunk or the response.completed event."""
+    try:
+        from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
+        from openai_cost_tracker import AsyncCostEstimator, CostEstimator
+
+        def chunk(**extra):
+            return ChatCompletionChunk.model_validate({
+                "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini",
+                "choices": [], **extra,
+            })
+
+        chat_chunks = [chunk(), chunk(usage={"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5})]
+        response_events = [
+            SimpleNamespace(type="response.created", response=None),
+            SimpleNamespace(type="response.completed", response={
+                "model": "gpt-4o-mini", "usage": {"input_tokens": 7, "output_tokens": 4, "total_tokens": 11},
+            }),
+        ]
+
+        class FakeStream:
+            def __init__(self, items):
+                self._items = items
+
+            def __iter__(self):
+                return iter(self._items)
+
+            async def __aiter__(self):
+                for item in self._items:
+                    yield item
+
+        def client(is_async):
+            return fake_client(
+                chat=FakeResource(lambda **kwargs: FakeStream(chat_chunks), is_async),
+                responses=FakeResource(lambda **kwargs: FakeStream(response_events), is_async),
+            )
+
+        async def run():
+            sync_estimator = CostEstimator(client(False), custom_output=NoOutput())
+            async with sync_estimator as proxy:
+                assert len(list(proxy.chat.completions.create(model="gpt-4o-mini", stream=True))) == 2, \
+                    "chunks lost"
+                for _ in proxy.responses.create(model="gpt-4o-mini", stream=True):
+                    pass
+
+            async_estimator = AsyncCostEstimator(client(True), custom_output=NoOutput())
+            async with async_estimator as proxy:
+                async for _ in await proxy.chat.completions.create(model="gpt-4o-mini", stream=True):
+                    pass
+                async for _ in await proxy.responses.create(model="gpt-4o-mini", stream=True):
+                    pass
+            return sync_estimator, async_estimator
+
+        for estimator in asyncio.run(run()):
+            assert estimator.totals.requests == 2, f"counted {estimator.totals.requests} of 2 streams"
+            assert estimator.totals.total_tokens == 16, f"counted {estimator.totals.total_tokens} of 16 tokens"
+        print("✓ Sync and async streams counted")
+        return True
+    except Exception as e:
+        print(f"✗ Stream counting test failed: {e!r}")
+        return False
+
+
+def test_stream_helpers_counted():
+    """Test that streams of the SDK `.stream(...)` helpers are counted once, iterated or not."""
+    try:
+        from openai_cost_tracker import AsyncCostEstimator, CostEstimator
+
+        final = {"model": "gpt-4o-mini", "usage": {"input_tokens": 7, "output_tokens": 4, "total_tokens": 11}}
+        events = [
+            SimpleNamespace(type="response.output_text.delta", delta="Hi"),
+            SimpleNamespace(type="response.completed", response=final),
+        ]
+
+        class FakeHelperStream:
+            def __iter__(self):
+                return iter(events)
+
+            async def __aiter__(self):
+                for event in events:
+                    yield event
+
+            def get_final_response(self):
+                return final
+
+        class FakeManager:
+            """Like ResponseStreamManager: only a context manager, the stream comes from entering it."""
+
+            def __enter__(self):
+                return FakeHelperStream()
+
+            def __exit__(self, *exc):
+                return None
+
+            async def __aenter__(self):
+                return FakeHelperStream()
+
+            async def __aexit__(self, *exc):
+                return None
+
+        class FakeResponses:
+            def stream(self, **kwargs):
+                return FakeManager()
+
+        async def run():
+            sync_estimator = CostEstimator(fake_client(responses=FakeResponses()), custom_output=NoOutput())
+            async with sync_estimator as proxy:
+                with proxy.responses.stream(model="gpt-4o-mini", input="Hi") as stream:
+                    for _ in stream:
+                        pass
+                with proxy.responses.stream(model="gpt-4o-mini", input="Hi") as stream:
+                    stream.get_final_response()
+
+            async_estimator = AsyncCostEstimator(fake_client(responses=FakeResponses()), custom_output=NoOutput())
+            async with async_estimator as proxy:
+                async with proxy.responses.stream(model="gpt-4o-mini", input="Hi") as stream:
+                    async for _ in stream:
+                        pass
+                async with proxy.responses.stream(model="gpt-4o-mini", input="Hi") as stream:
+                    stream.get_final_response()
+            return sync_estimator, async_estimator
+
+        for estimator in asyncio.run(run()):
+            assert estimator.totals.requests == 2, f"counted {estimator.totals.requests} of 2 streams"
+            assert estimator.totals.total_tokens == 22, f"counted {estimator.totals.total_tokens} of 22 tokens"
+        print("✓ Stream helpers counted")
+        return True
+    except Exception as e:
+        print(f"✗ Stream helpers test failed: {e!r}")
+        return False
+
+
+def test_calc_cost_precision():
+    """Test that cost precision doesn't depend on import order or global decimal settings."""
+    try:
+        import decimal
+        import subprocess
+        import sys
+
+        code = "import openai_cost_tracker as o; print(o._calc_cost('gpt-4o', 1_000_000, 0, 0))"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        assert out.strip() == "2.50000", f"cost {out.strip()}"
+
+        prec = decimal.getcontext().prec
+        from openai_cost_tracker import CostEstimator  # noqa: F401
+        assert decimal.getcontext().prec == prec, "import changed the global decimal precision"
+        print("✓ Cost precision is independent of the global decimal context")
+        return True
+    except Exception as e:
+        print(f"✗ Cost precision test failed: {e!r}")
+        return False
+
 if __name__ == "__main__":
     print("Testing OpenAI Cost Tracker package...")
     print("-" * 40)
@@ -46,6 +614,19 @@ if __name__ == "__main__":
     success = True
     success &= test_imports()
     success &= test_schemas()
+    success &= test_embeddings_coalescing()
+    success &= test_embeddings_coalescing_cancellation()
+    success &= test_lazy_imports()
+    success &= test_calc_cost_precision()
+    success &= test_price_catalog()
+    success &= test_price_catalog_change_detection()
+    success &= test_prompt_token_estimator()
+    success &= test_sampling()
+    success &= test_sync_proxy_counts_responses()
+    success &= test_response_without_usage()
+    success &= test_async_totals_updated_inline()
+    success &= test_streams_counted()
+    success &= test_stream_helpers_counted()
     
     print("-" * 40)
     if success: